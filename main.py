@@ -1,32 +1,79 @@
+import asyncio
 import ccxt
+import ccxt.async_support as ccxt_async
 import redis
-import json
+import redis.asyncio as aioredis
+import orjson
 import time
 import logging
 import sqlite3
 import os
-import matplotlib.pyplot as plt
-from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
-from requests.exceptions import ConnectionError, Timeout
+import queue
+import threading
+from pathlib import Path
+import numpy as np
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 
 logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 1  # seconds, doubled on every failed attempt
+RETRY_MAX_DELAY = 30
+STREAM_MAXLEN = 1_000_000  # approximate cap on entries kept per symbol stream
+STREAM_RETENTION_MS = 86400 * 1000  # entries older than 24 hours are trimmed
+PIPELINE_CHUNK = 256  # stream entries per pipeline flush
+MAX_PLOT_POINTS = 5000  # visualize_data downsamples larger ranges to at most this many points
+READ_POOL_SIZE = 4  # read-only SQLite connections for backup queries
+READ_POOL_TIMEOUT = 10  # seconds a backup query waits for a free read connection
+LARGE_VOLUME_THRESHOLD = 10.0  # Example threshold for large trade volume
+PRICE_SPIKE_THRESHOLD = 0.01  # Example threshold for price spike
+REQUIRED_TRADE_KEYS = frozenset({'id', 'timestamp', 'symbol', 'price', 'amount', 'side'})
+
+
+def _retry_delay(attempt):
+    if attempt + 1 >= MAX_RETRIES:
+        return 0
+    return min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+
+
+def _backoff(attempt):
+    time.sleep(_retry_delay(attempt))
+
+
+async def _async_backoff(attempt):
+    await asyncio.sleep(_retry_delay(attempt))
+
+
+def _stream_id(trade_data):
+    # Redis 7+ fills in the sequence number for trades sharing a millisecond
+    return f"{int(trade_data['timestamp'])}-*"
+
+
+def _is_stale_stream_id(error):
+    return 'equal or smaller than the target stream top item' in str(error)
+
+
 class CryptoDataCollector:
     def __init__(self, exchange_name, api_key=None, api_secret=None, redis_host=os.environ.get("REDIS_HOST", "localhost"),
                  redis_port=int(os.environ.get("REDIS_PORT", 6379)), redis_db=int(os.environ.get("REDIS_DB", 0))):
 
         self.exchange = self._initialize_exchange(exchange_name, api_key, api_secret)
-        self.redis_client = redis.Redis(host=redis_host, port=redis_port, db=redis_db)
-        self.scheduler = BackgroundScheduler()
-        self.backup_conn = sqlite3.connect(os.environ.get('SQLITE_DB_PATH', 'crypto_backup.db'), timeout=10)
+        self.redis_client = aioredis.Redis(host=redis_host, port=redis_port, db=redis_db)
+        self.scheduler = AsyncIOScheduler()
+        # stream key -> (newest timestamp, trade ids at that timestamp)
+        self._stream_watermarks = {}
+        self._db_path = os.environ.get('SQLITE_DB_PATH', 'crypto_backup.db')
+        self._write_conn = sqlite3.connect(self._db_path, timeout=10, check_same_thread=False)
+        self._write_lock = threading.Lock()
         self._initialize_backup_db()
+        self._read_pool = self._initialize_read_pool()
+        self._read_pool_closed = False
 
     def _initialize_exchange(self, exchange_name, api_key, api_secret):
         try:
-            exchange_class = getattr(ccxt, exchange_name)
+            exchange_class = getattr(ccxt_async, exchange_name)
             exchange = exchange_class({
                 'apiKey': api_key,
                 'secret': api_secret,
@@ -40,175 +87,368 @@ class CryptoDataCollector:
 
     def _initialize_backup_db(self):
         try:
-            cursor = self.backup_conn.cursor()
+            cursor = self._write_conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA mmap_size=268435456")
+            cursor.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
             cursor.execute('''CREATE TABLE IF NOT EXISTS trades 
                               (trade_id TEXT, symbol TEXT, price REAL, amount REAL, side TEXT, timestamp INTEGER)''')
-            self.backup_conn.commit()
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_trades_sym_ts ON trades(symbol, timestamp)")
+            # One-time migration: drop duplicate (symbol, trade_id) rows so the unique index can be created
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_trades_sym_id'")
+            if cursor.fetchone() is None:
+                cursor.execute('''DELETE FROM trades WHERE rowid NOT IN
+                                  (SELECT MIN(rowid) FROM trades GROUP BY symbol, trade_id)''')
+                logger.info(f"Removed {cursor.rowcount} duplicate trades from the SQLite backup")
+                cursor.execute("CREATE UNIQUE INDEX idx_trades_sym_id ON trades(symbol, trade_id)")
+            self._write_conn.commit()
+            self._insert_sql = '''INSERT OR IGNORE INTO trades (trade_id, symbol, price, amount, side, timestamp) 
+                                  VALUES (?, ?, ?, ?, ?, ?)'''
+            self._insert_cursor = cursor
             logger.info("SQLite backup database initialized successfully.")
         except sqlite3.Error as e:
             logger.error(f"Error initializing SQLite backup DB: {str(e)}")
             raise
 
-    def fetch_trades_and_order_book(self, symbol='BTC/USDT'):
-        try:
-            order_book = self.exchange.fetch_order_book(symbol)
-            timestamp = datetime.now().timestamp()
-
-            trades = self.exchange.fetch_trades(symbol)
-
-            for trade in trades:
-                trade_id = trade['id']
-                trade_data = {
-                    'timestamp': trade['timestamp'],
-                    'symbol': symbol,
-                    'price': trade['price'],
-                    'amount': trade['amount'],
-                    'side': trade['side'],
-                    'order_book_bids': json.dumps(order_book['bids']),
-                    'order_book_asks': json.dumps(order_book['asks']),
-                }
-
-                if not self._validate_trade_data(trade_data):
-                    logger.warning(f"Invalid trade data detected: {trade_data}")
-                    continue
-
-                primary_key = f"{symbol}:{trade_id}:{int(trade['timestamp'])}"
-
-                self._store_trade_in_redis(primary_key, trade_data)
-
-                sorted_set_key = f"{symbol}:trades"
-                self._store_in_sorted_set(sorted_set_key, primary_key, trade['timestamp'])
-
-                self._backup_trade_to_db(trade_id, symbol, trade_data)
-
-                self._check_trade_conditions(trade_data)
-
-                logger.info(f"Stored trade data for {symbol} with trade ID {trade_id}")
-
-        except (ccxt.NetworkError, ConnectionError, Timeout) as e:
-            logger.error(f"Network error occurred: {str(e)} - Retrying...")
-            time.sleep(5)
-            self.fetch_trades_and_order_book(symbol)
-        except ccxt.BaseError as e:
-            logger.error(f"Exchange error occurred: {str(e)}")
-        except Exception as e:
-            logger.error(f"Unexpected error occurred: {str(e)}")
-
-    def _validate_trade_data(self, trade_data):
-        required_keys = ['timestamp', 'symbol', 'price', 'amount', 'side']
-        return all(key in trade_data for key in required_keys)
-
-    def _store_trade_in_redis(self, primary_key, trade_data):
+    def _initialize_read_pool(self):
         try:
-            self.redis_client.hmset(primary_key, trade_data)
-            self.redis_client.expire(primary_key, 86400)  # Set TTL of 24 hours
-        except redis.ConnectionError as e:
-            logger.error(f"Redis connection error: {str(e)} - Retrying...")
-            time.sleep(5)
-            self._store_trade_in_redis(primary_key, trade_data)
+            read_pool = queue.Queue()
+            read_uri = f"{Path(self._db_path).absolute().as_uri()}?mode=ro"
+            for _ in range(READ_POOL_SIZE):
+                conn = sqlite3.connect(read_uri, uri=True, timeout=10, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA mmap_size=268435456")
+                read_pool.put(conn)
+            return read_pool
+        except sqlite3.Error as e:
+            logger.error(f"Error opening SQLite read connections: {str(e)}")
+            raise
 
-    def _store_in_sorted_set(self, sorted_set_key, primary_key, timestamp):
-        try:
-            self.redis_client.zadd(sorted_set_key, {primary_key: timestamp})
-        except redis.ConnectionError as e:
-            logger.error(f"Redis connection error while storing in sorted set: {str(e)} - Retrying...")
-            time.sleep(5)
-            self._store_in_sorted_set(sorted_set_key, primary_key, timestamp)
+    async def fetch_trades_and_order_book(self, symbol='BTC/USDT'):
+        for attempt in range(MAX_RETRIES):
+            try:
+                order_book, trades = await asyncio.gather(self.exchange.fetch_order_book(symbol),
+                                                          self.exchange.fetch_trades(symbol))
+
+                stream_key = f"{symbol}:stream"
+                last_ts, seen_ids = await self._stream_watermark(stream_key)
+                bids_json = orjson.dumps(order_book['bids'])
+                asks_json = orjson.dumps(order_book['asks'])
+                stream_batch = []
+                backup_rows = []
+
+                for trade in trades:
+                    if not self._validate_trade_data(trade):
+                        logger.warning(f"Invalid trade data detected: {trade}")
+                        continue
+
+                    trade_id, trade_ts = trade['id'], trade['timestamp']
+
+                    # Consecutive polls return overlapping windows; skip trades already in the stream
+                    if trade_ts < last_ts or (trade_ts == last_ts and trade_id in seen_ids):
+                        continue
+
+                    price, amount, side = trade['price'], trade['amount'], trade['side']
+                    trade_data = {
+                        'trade_id': trade_id,
+                        'timestamp': trade_ts,
+                        'symbol': symbol,
+                        'price': price,
+                        'amount': amount,
+                        'side': side,
+                        'order_book_bids': bids_json,
+                        'order_book_asks': asks_json,
+                    }
+
+                    stream_batch.append(trade_data)
+
+                    backup_rows.append((trade_id, symbol, price, amount, side, trade_ts))
+
+                    self._check_trade_conditions(trade_data)
+
+                    logger.debug("Queued trade %s for %s", trade_id, symbol)
+
+                if stream_batch:
+                    stored = await self._store_trades_in_redis_pipeline(stream_key, stream_batch)
+                    await asyncio.to_thread(self._backup_trades_to_db, backup_rows)
+                    if stored is not None:
+                        logger.info("Stored %d of %d trades for %s", stored, len(stream_batch), symbol)
+                    else:
+                        logger.warning("Redis flush failed; %d trades for %s went to the SQLite backup only",
+                                       len(stream_batch), symbol)
+                return
+
+            except ccxt.NetworkError as e:
+                logger.error(f"Network error occurred: {str(e)} - Retrying...")
+                await _async_backoff(attempt)
+            except ccxt.BaseError as e:
+                logger.error(f"Exchange error occurred: {str(e)}")
+                return
+            except Exception as e:
+                logger.error(f"Unexpected error occurred: {str(e)}")
+                return
+        logger.error(f"Giving up fetching {symbol} after {MAX_RETRIES} attempts")
+
+    def _validate_trade_data(self, trade):
+        # ccxt's unified trade always has every key and marks missing values with None
+        return all(trade.get(key) is not None for key in REQUIRED_TRADE_KEYS)
+
+    async def _stream_watermark(self, stream_key):
+        if stream_key not in self._stream_watermarks:
+            try:
+                last_entries = await self.redis_client.xrevrange(stream_key, count=1)
+                if last_entries:
+                    top_ts = int(last_entries[0][0].split(b'-')[0])
+                    top_entries = await self.redis_client.xrevrange(stream_key, max=f"{top_ts}", min=f"{top_ts}")
+                    seed = (top_ts, {fields[b'trade_id'].decode() for _, fields in top_entries})
+                else:
+                    seed = (-1, set())
+            except redis.ConnectionError as e:
+                # Not cached, so the next fetch retries the seed
+                logger.error(f"Redis connection error while reading {stream_key}: {str(e)}")
+                return -1, set()
+            self._stream_watermarks[stream_key] = seed
+        return self._stream_watermarks[stream_key]
+
+    async def _store_trade_in_redis(self, stream_key, trade_data):
+        for attempt in range(MAX_RETRIES):
+            try:
+                await self.redis_client.xadd(stream_key, trade_data, id=_stream_id(trade_data),
+                                             maxlen=STREAM_MAXLEN, approximate=True)
+                return
+            except redis.ResponseError as e:
+                if _is_stale_stream_id(e):
+                    logger.warning(f"Skipped trade below the top of {stream_key}: {str(e)}")
+                else:
+                    logger.error(f"Redis rejected trade for {stream_key}: {str(e)}")
+                return
+            except redis.ConnectionError as e:
+                logger.error(f"Redis connection error: {str(e)} - Retrying...")
+                await _async_backoff(attempt)
+        logger.error(f"Giving up storing trade in {stream_key} after {MAX_RETRIES} attempts")
+
+    async def _store_trades_in_redis_pipeline(self, stream_key, stream_batch):
+        stored = 0
+        for start in range(0, len(stream_batch), PIPELINE_CHUNK):
+            is_last_chunk = start + PIPELINE_CHUNK >= len(stream_batch)
+            chunk_stored = await self._store_stream_chunk(stream_key, stream_batch[start:start + PIPELINE_CHUNK],
+                                                          trim=is_last_chunk)
+            if chunk_stored is None:
+                return None
+            stored += chunk_stored
+        return stored
+
+    async def _store_stream_chunk(self, stream_key, chunk, trim=False):
+        for attempt in range(MAX_RETRIES):
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for trade_data in chunk:
+                    pipe.xadd(stream_key, trade_data, id=_stream_id(trade_data), maxlen=STREAM_MAXLEN, approximate=True)
+                if trim:
+                    pipe.xtrim(stream_key, minid=int(time.time() * 1000) - STREAM_RETENTION_MS, approximate=True)
+                results = await pipe.execute(raise_on_error=False)
+                errors = [result for result in results[:len(chunk)] if isinstance(result, redis.ResponseError)]
+                stale = sum(_is_stale_stream_id(error) for error in errors)
+                if stale:
+                    logger.warning(f"Skipped {stale} trades below the top of {stream_key}")
+                if len(errors) > stale:
+                    # e.g. "Invalid stream ID" on Redis < 7
+                    logger.error(f"Redis rejected {len(errors) - stale} of {len(chunk)} trades for {stream_key}: "
+                                 f"{next(str(error) for error in errors if not _is_stale_stream_id(error))}")
+                    return None
+
+                newest_ts = chunk[-1]['timestamp']
+                last_ts, seen_ids = self._stream_watermarks.get(stream_key, (-1, set()))
+                newest_ids = {trade_data['trade_id'] for trade_data in chunk if trade_data['timestamp'] == newest_ts}
+                if newest_ts == last_ts:
+                    newest_ids |= seen_ids
+                self._stream_watermarks[stream_key] = (newest_ts, newest_ids)
+                return len(chunk) - stale
+            except redis.ConnectionError as e:
+                logger.error(f"Redis connection error while flushing pipeline: {str(e)} - Retrying...")
+                await _async_backoff(attempt)
+        logger.error(f"Giving up storing {len(chunk)} trades in Redis after {MAX_RETRIES} attempts")
+        return None
 
     def _backup_trade_to_db(self, trade_id, symbol, trade_data):
+        for attempt in range(MAX_RETRIES):
+            try:
+                with self._write_lock:
+                    self._insert_cursor.execute(self._insert_sql,
+                                                (trade_id, symbol, trade_data['price'], trade_data['amount'],
+                                                 trade_data['side'], trade_data['timestamp']))
+                    self._write_conn.commit()
+                logger.debug("Backed up trade data for trade ID %s to SQLite", trade_id)
+                return
+            except sqlite3.OperationalError as e:
+                logger.error(f"SQLite operational error: {str(e)} - Retrying...")
+                _backoff(attempt)
+        logger.error(f"Giving up backing up trade ID {trade_id} to SQLite after {MAX_RETRIES} attempts")
+
+    def _backup_trades_to_db(self, backup_rows):
+        for attempt in range(MAX_RETRIES):
+            try:
+                with self._write_lock, self._write_conn:
+                    self._insert_cursor.executemany(self._insert_sql, backup_rows)
+                logger.debug("Backed up %d trades to SQLite", len(backup_rows))
+                return
+            except sqlite3.OperationalError as e:
+                logger.error(f"SQLite operational error: {str(e)} - Retrying...")
+                _backoff(attempt)
+        logger.error(f"Giving up backing up {len(backup_rows)} trades to SQLite after {MAX_RETRIES} attempts")
+
+    def _query_backup(self, sql, params):
+        if self._read_pool_closed:
+            raise sqlite3.ProgrammingError("Cannot query the backup database after stop_collecting")
+        try:
+            conn = self._read_pool.get(timeout=READ_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No read connection free after {READ_POOL_TIMEOUT}s") from None
         try:
-            cursor = self.backup_conn.cursor()
-            cursor.execute('''INSERT INTO trades (trade_id, symbol, price, amount, side, timestamp) 
-                              VALUES (?, ?, ?, ?, ?, ?)''',
-                           (trade_id, symbol, trade_data['price'], trade_data['amount'], trade_data['side'], trade_data['timestamp']))
-            self.backup_conn.commit()
-            logger.info(f"Backed up trade data for trade ID {trade_id} to SQLite")
-        except sqlite3.OperationalError as e:
-            logger.error(f"SQLite operational error: {str(e)} - Retrying...")
-            time.sleep(5)
-            self._backup_trade_to_db(trade_id, symbol, trade_data)
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        finally:
+            if self._read_pool_closed:
+                conn.close()
+            else:
+                self._read_pool.put(conn)
 
     def _check_trade_conditions(self, trade_data):
-        large_volume_threshold = 10.0  # Example threshold for large trade volume
-        price_spike_threshold = 0.01  # Example threshold for price spike
-
-        if trade_data['amount'] > large_volume_threshold:
+        if trade_data['amount'] > LARGE_VOLUME_THRESHOLD:
             logger.info(f"Large trade detected: {trade_data['amount']} units at price {trade_data['price']}")
 
 
 
-    def search_data(self, symbol=None, start_time=None, end_time=None):
-        sorted_set_key = f"{symbol}:trades"
+    async def search_data(self, symbol=None, start_time=None, end_time=None):
+        stream_key = f"{symbol}:stream"
         results = []
 
         try:
             if (start_time and end_time):
-                trade_keys = self.redis_client.zrangebyscore(sorted_set_key, start_time, end_time)
+                entries = await self.redis_client.xrange(stream_key, min=start_time, max=end_time)
             else:
-                trade_keys = self.redis_client.zrangebyscore(sorted_set_key, '-inf', '+inf')
+                entries = await self.redis_client.xrange(stream_key)
 
-            for key in trade_keys:
-                results.append(self.redis_client.hgetall(key))
+            results = [{key.decode(): value.decode() for key, value in fields.items()} for _, fields in entries]
 
         except redis.ConnectionError as e:
             logger.error(f"Redis connection error during search: {str(e)}")
 
         return results
 
-    def visualize_data(self, symbol, start_time=None, end_time=None):
+    async def search_backup_data(self, symbol, start_time=None, end_time=None):
+        if start_time and end_time:
+            sql = '''SELECT trade_id, symbol, price, amount, side, timestamp FROM trades
+                     WHERE symbol = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp'''
+            params = (symbol, start_time, end_time)
+        else:
+            sql = '''SELECT trade_id, symbol, price, amount, side, timestamp FROM trades
+                     WHERE symbol = ? ORDER BY timestamp'''
+            params = (symbol,)
+
+        try:
+            return await asyncio.to_thread(self._query_backup, sql, params)
+        except sqlite3.Error as e:
+            logger.error(f"SQLite error during backup search: {str(e)}")
+            return []
+
+    async def visualize_data(self, symbol, start_time=None, end_time=None, output_path=None):
         try:
-            trades = self.search_data(symbol=symbol, start_time=start_time, end_time=end_time)
-            prices = [float(trade[b'price']) for trade in trades]
-            volumes = [float(trade[b'amount']) for trade in trades]
-            timestamps = [datetime.fromtimestamp(int(trade[b'timestamp'])) for trade in trades]
-
-            plt.figure(figsize=(12, 6))
-            plt.subplot(2, 1, 1)
-            plt.plot(timestamps, prices, label='Price')
-            plt.title(f'Price Trend for {symbol}')
-            plt.xlabel('Time')
-            plt.ylabel('Price')
-            plt.grid(True)
-
-            plt.subplot(2, 1, 2)
-            plt.bar(timestamps, volumes, label='Volume', color='orange')
-            plt.title(f'Volume Trend for {symbol}')
-            plt.xlabel('Time')
-            plt.ylabel('Volume')
-            plt.grid(True)
-
-            plt.tight_layout()
-            plt.show()
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+            trades = await self.search_data(symbol=symbol, start_time=start_time, end_time=end_time)
+            n = len(trades)
+            prices = np.empty(n)
+            volumes = np.empty(n)
+            epoch_ms = np.empty(n, dtype='int64')
+            for i, trade in enumerate(trades):
+                prices[i] = float(trade['price'])
+                volumes[i] = float(trade['amount'])
+                epoch_ms[i] = int(trade['timestamp'])
+            timestamps = epoch_ms.astype('datetime64[ms]')
+
+            if n > MAX_PLOT_POINTS:
+                bucket_starts = np.arange(0, n, -(-n // MAX_PLOT_POINTS))
+                volumes = np.add.reduceat(volumes, bucket_starts)
+                timestamps, prices = timestamps[bucket_starts], prices[bucket_starts]
+
+            fig = Figure(figsize=(12, 6))
+            FigureCanvasAgg(fig)
+            price_ax = fig.add_subplot(2, 1, 1)
+            price_ax.plot(timestamps, prices, label='Price')
+            price_ax.set_title(f'Price Trend for {symbol}')
+            price_ax.set_xlabel('Time')
+            price_ax.set_ylabel('Price')
+            price_ax.grid(True)
+
+            volume_ax = fig.add_subplot(2, 1, 2)
+            volume_ax.bar(timestamps, volumes, label='Volume', color='orange')
+            volume_ax.set_title(f'Volume Trend for {symbol}')
+            volume_ax.set_xlabel('Time')
+            volume_ax.set_ylabel('Volume')
+            volume_ax.grid(True)
+
+            fig.tight_layout()
+            output_path = output_path or f"{symbol.replace('/', '_')}_trends.png"
+            fig.savefig(output_path)
+            logger.info(f"Saved {symbol} trend plot to {output_path}")
+            return output_path
 
         except Exception as e:
             logger.error(f"Error during data visualization: {str(e)}")
 
     def start_collecting(self, symbol='BTC/USDT', interval_seconds=10):
         try:
-            self.scheduler.add_job(self.fetch_trades_and_order_book, 'interval', seconds=interval_seconds, args=[symbol])
+            self.scheduler.add_job(self.fetch_trades_and_order_book, 'interval', seconds=interval_seconds, args=[symbol],
+                                   coalesce=True, max_instances=1, misfire_grace_time=5)
             self.scheduler.start()
         except Exception as e:
             logger.error(f"Error starting data collection: {str(e)}")
 
-    def stop_collecting(self):
+    async def stop_collecting(self):
         try:
-            self.scheduler.shutdown()
-            self.backup_conn.close()
-            logger.info("Data collection stopped and database connection closed.")
+            if self.scheduler.running:
+                self.scheduler.shutdown()
         except Exception as e:
-            logger.error(f"Error stopping data collection: {str(e)}")
-
-if __name__ == "__main__":
-
+            logger.error(f"Error stopping scheduler: {str(e)}")
+        try:
+            await self.exchange.close()
+        except Exception as e:
+            logger.error(f"Error closing exchange connection: {str(e)}")
+        try:
+            await self.redis_client.close()
+        except Exception as e:
+            logger.error(f"Error closing Redis connection: {str(e)}")
+        try:
+            with self._write_lock:
+                self._write_conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error closing SQLite write connection: {str(e)}")
+        self._read_pool_closed = True
+        while not self._read_pool.empty():
+            try:
+                self._read_pool.get_nowait().close()
+            except sqlite3.Error as e:
+                logger.error(f"Error closing SQLite read connection: {str(e)}")
+        logger.info("Data collection stopped and database connections closed.")
+
+async def main():
     api_key = os.environ.get("API_KEY")
     api_secret = os.environ.get("API_SECRET")
 
     collector = CryptoDataCollector(exchange_name='binance', api_key=api_key, api_secret=api_secret)
     collector.start_collecting(symbol='BTC/USDT', interval_seconds=10)
 
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await collector.stop_collecting()
+
+if __name__ == "__main__":
 
     try:
-        while True:
-            time.sleep(1)
+        asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        collector.stop_collecting()
+        pass
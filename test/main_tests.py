@@ -1,9 +1,11 @@
 import unittest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 from main import CryptoDataCollector
 import ccxt
 import redis
 import sqlite3
+import orjson
 import os
 import logging
 from dotenv import load_dotenv
@@ -13,30 +15,35 @@ load_dotenv()
 
 # Set up logger
 log_level = os.environ.get("LOG_LEVEL", "DEBUG")
-logger = logging.getLogger("CryptoDataCollector")
+logger = logging.getLogger("main")
 logging.basicConfig(level=getattr(logging, log_level))
 
-class TestCryptoDataCollector(unittest.TestCase):
+class TestCryptoDataCollector(unittest.IsolatedAsyncioTestCase):
 
-    @patch('ccxt.binance')
-    @patch('redis.Redis')
+    @patch('ccxt.async_support.binance')
+    @patch('redis.asyncio.Redis')
     @patch('sqlite3.connect')
-    def setUp(self, mock_sqlite_connect, mock_redis, mock_binance):
+    async def asyncSetUp(self, mock_sqlite_connect, mock_redis, mock_binance):
         # Mocking the Binance exchange
         self.mock_exchange = mock_binance.return_value
-        self.mock_exchange.fetch_order_book.return_value = {
+        self.mock_exchange.fetch_order_book = AsyncMock(return_value={
             'bids': [[50000, 1], [49900, 2]],
             'asks': [[50100, 1], [50200, 2]],
-        }
-        self.mock_exchange.fetch_trades.return_value = [
+        })
+        self.mock_exchange.fetch_trades = AsyncMock(return_value=[
             {'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'},
             {'id': '2', 'timestamp': 1625256001, 'symbol': 'BTC/USDT', 'price': 50100, 'amount': 0.3, 'side': 'sell'},
-        ]
+        ])
 
-        # Mocking Redis
+        # Mocking Redis: commands are awaited, pipelines are built synchronously and awaited on execute()
         self.mock_redis_client = mock_redis.return_value
+        self.mock_redis_client.xadd = AsyncMock()
+        self.mock_redis_client.xrange = AsyncMock(return_value=[])
+        self.mock_redis_client.xrevrange = AsyncMock(return_value=[])
+        self.mock_redis_client.pipeline.return_value.execute = AsyncMock(return_value=[])
 
         # Mocking SQLite connection
+        self.mock_sqlite_connect = mock_sqlite_connect
         self.mock_sqlite_conn = mock_sqlite_connect.return_value
         self.mock_sqlite_cursor = self.mock_sqlite_conn.cursor.return_value
 
@@ -51,72 +58,107 @@ class TestCryptoDataCollector(unittest.TestCase):
         self.assertIsInstance(self.collector.exchange, MagicMock)
         self.assertTrue(self.mock_exchange.enableRateLimit)
 
-    def test_fetch_trades_and_order_book(self):
-        self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+    async def test_fetch_trades_and_order_book(self):
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
         self.mock_exchange.fetch_order_book.assert_called_once_with('BTC/USDT')
         self.mock_exchange.fetch_trades.assert_called_once_with('BTC/USDT')
-        self.assertTrue(self.mock_redis_client.hset.called)
-        self.assertTrue(self.mock_redis_client.expire.called)
-        self.assertTrue(self.mock_redis_client.zadd.called)
-        self.assertTrue(self.mock_sqlite_cursor.execute.called)
-        self.assertTrue(self.mock_sqlite_conn.commit.called)
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        self.mock_redis_client.pipeline.assert_called_once_with(transaction=False)
+        self.assertEqual(mock_pipe.xadd.call_count, 2)
+        stream_key, fields = mock_pipe.xadd.call_args_list[0][0]
+        self.assertEqual(stream_key, 'BTC/USDT:stream')
+        self.assertEqual(fields['trade_id'], '1')
+        self.assertEqual(fields['price'], 50000)
+        self.assertEqual(orjson.loads(fields['order_book_bids']), [[50000, 1], [49900, 2]])
+        self.assertEqual(mock_pipe.xadd.call_args_list[0][1]['id'], '1625256000-*')
+        mock_pipe.xtrim.assert_called_once()
+        mock_pipe.execute.assert_called_once()
+        self.mock_sqlite_cursor.executemany.assert_called_once()
+        self.assertEqual(len(self.mock_sqlite_cursor.executemany.call_args[0][1]), 2)
+        self.mock_sqlite_conn.__exit__.assert_called_once()
 
-    def test_data_retrieval_with_missing_fields(self):
+    async def test_data_retrieval_with_missing_fields(self):
         self.mock_exchange.fetch_trades.return_value = [
             {'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000}  # Missing 'amount' and 'side'
         ]
         with self.assertLogs(logger, level='WARNING') as log:
-            self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
             self.assertIn("Invalid trade data detected", log.output[0])
 
-    @patch('time.sleep', return_value=None)
-    def test_rate_limit_handling(self, mock_sleep):
+    async def test_malformed_trade_is_skipped(self):
+        self.mock_exchange.fetch_trades.return_value = [
+            {'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'},
+            {'id': '2', 'timestamp': 1625256001, 'symbol': 'BTC/USDT', 'price': 50001},  # Missing 'amount' and 'side'
+            {'id': '3', 'timestamp': 1625256002, 'symbol': 'BTC/USDT', 'price': 50002, 'amount': 0.5, 'side': 'sell'},
+        ]
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        self.assertEqual([call[0][1]['trade_id'] for call in mock_pipe.xadd.call_args_list], ['1', '3'])
+        self.assertEqual(len(self.mock_sqlite_cursor.executemany.call_args[0][1]), 2)
+
+    async def test_trade_with_none_field_is_skipped(self):
+        self.mock_exchange.fetch_trades.return_value = [
+            {'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': None, 'side': 'buy'},
+            {'id': '2', 'timestamp': 1625256001, 'symbol': 'BTC/USDT', 'price': 50100, 'amount': 0.3, 'side': 'sell'},
+        ]
+        with self.assertLogs(logger, level='WARNING') as log:
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+            self.assertIn("Invalid trade data detected", log.output[0])
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        self.assertEqual([call[0][1]['trade_id'] for call in mock_pipe.xadd.call_args_list], ['2'])
+        self.assertEqual(len(self.mock_sqlite_cursor.executemany.call_args[0][1]), 1)
+
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    async def test_rate_limit_handling(self, mock_sleep):
         self.mock_exchange.fetch_trades.side_effect = ccxt.RateLimitExceeded('Rate limit exceeded')
         with self.assertLogs(logger, level='ERROR') as log:
-            self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
             self.assertIn("Network error occurred", log.output[0])
             self.assertTrue(mock_sleep.called)
 
-    def test_store_duplicate_data_in_redis(self):
+    async def test_store_trade_rejected_by_stream_is_not_retried(self):
         trade_data = {'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'}
-        primary_key = 'BTC/USDT:1:1625256000'
-        self.collector._store_trade_in_redis(primary_key, trade_data)
-        self.mock_redis_client.hset.assert_called_with(primary_key, trade_data)
-        self.mock_redis_client.expire.assert_called_with(primary_key, 86400)
-        # Simulate duplicate data entry
-        self.collector._store_trade_in_redis(primary_key, trade_data)
-        self.mock_redis_client.hset.assert_called_with(primary_key, trade_data)
-
-    def test_redis_storage_edge_cases(self):
-        self.mock_redis_client.zrangebyscore.return_value = []
-        results = self.collector.search_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
+        stream_key = 'BTC/USDT:stream'
+        await self.collector._store_trade_in_redis(stream_key, trade_data)
+        self.mock_redis_client.xadd.assert_called_with(stream_key, trade_data, id='1625256000-*',
+                                                       maxlen=1_000_000, approximate=True)
+        # An entry older than the stream's top is rejected by Redis; retrying cannot succeed
+        self.mock_redis_client.xadd.side_effect = redis.ResponseError(
+            'ERR The ID specified in XADD is equal or smaller than the target stream top item')
+        await self.collector._store_trade_in_redis(stream_key, trade_data)
+        self.assertEqual(self.mock_redis_client.xadd.await_count, 2)
+
+    async def test_redis_storage_edge_cases(self):
+        self.mock_redis_client.xrange.return_value = []
+        results = await self.collector.search_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
         self.assertEqual(len(results), 0)
 
     @patch('time.time', side_effect=lambda: time.time() + 0.001)
-    def test_performance_high_frequency_storage(self, mock_time):
+    async def test_performance_high_frequency_storage(self, mock_time):
         for i in range(10000):  # Simulate high-frequency data input
             trade_data = {'timestamp': 1625256000 + i, 'symbol': 'BTC/USDT', 'price': 50000 + i, 'amount': 0.5, 'side': 'buy'}
-            primary_key = f'BTC/USDT:{i}:{1625256000 + i}'
-            self.collector._store_trade_in_redis(primary_key, trade_data)
-        self.assertTrue(self.mock_redis_client.hset.called)
+            await self.collector._store_trade_in_redis('BTC/USDT:stream', trade_data)
+        self.assertTrue(self.mock_redis_client.xadd.called)
 
-    @patch('time.sleep', return_value=None)
-    def test_connection_failure_handling(self, mock_sleep):
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    async def test_connection_failure_handling(self, mock_sleep):
         self.mock_exchange.fetch_order_book.side_effect = ccxt.NetworkError('Network error')
         with self.assertLogs(logger, level='ERROR') as log:
-            self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
             self.assertIn("Network error occurred", log.output[0])
             self.assertTrue(mock_sleep.called)
 
-    def test_redis_connection_error_handling(self):
-        self.mock_redis_client.hset.side_effect = redis.ConnectionError('Connection failed')
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    async def test_redis_connection_error_handling(self, mock_sleep):
+        self.mock_redis_client.xadd.side_effect = redis.ConnectionError('Connection failed')
         trade_data = {'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'}
-        primary_key = 'BTC/USDT:1:1625256000'
+        stream_key = 'BTC/USDT:stream'
         with self.assertLogs(logger, level='ERROR') as log:
-            self.collector._store_trade_in_redis(primary_key, trade_data)
+            await self.collector._store_trade_in_redis(stream_key, trade_data)
             self.assertIn("Redis connection error", log.output[0])
 
-    def test_sqlite_connection_error_handling(self):
+    @patch('time.sleep', return_value=None)
+    def test_sqlite_connection_error_handling(self, mock_sleep):
         self.mock_sqlite_cursor.execute.side_effect = sqlite3.OperationalError('Database locked')
         trade_data = {'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'}
         trade_id = '1'
@@ -125,35 +167,175 @@ class TestCryptoDataCollector(unittest.TestCase):
             self.collector._backup_trade_to_db(trade_id, symbol, trade_data)
             self.assertIn("SQLite operational error", log.output[0])
 
-    def test_api_response_edge_cases(self):
+    async def test_api_response_edge_cases(self):
         self.mock_exchange.fetch_trades.return_value = []
-        self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
         self.mock_exchange.fetch_trades.assert_called_once_with('BTC/USDT')
-        self.assertFalse(self.mock_redis_client.hset.called)
+        self.assertFalse(self.mock_redis_client.pipeline.called)
 
         self.mock_exchange.fetch_trades.return_value = [{'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT'}]
         with self.assertLogs(logger, level='WARNING') as log:
-            self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
             self.assertIn("Invalid trade data detected", log.output[0])
 
-    def test_search_data_no_matching_results(self):
-        self.mock_redis_client.zrangebyscore.return_value = []
-        results = self.collector.search_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
+    async def test_search_data_no_matching_results(self):
+        self.mock_redis_client.xrange.return_value = []
+        results = await self.collector.search_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
         self.assertEqual(len(results), 0)
 
-    def test_latency_in_data_storage(self):
+    async def test_rejected_stream_entry_does_not_abort_backup(self):
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        mock_pipe.execute.return_value = [redis.ResponseError(
+            'ERR The ID specified in XADD is equal or smaller than the target stream top item'), b'1625256001-0', 0]
+        with self.assertLogs(logger, level='INFO') as log:
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        mock_pipe.execute.assert_awaited_once_with(raise_on_error=False)
+        self.mock_sqlite_cursor.executemany.assert_called_once()
+        self.assertIn("Stored 1 of 2 trades", log.output[-1])
+
+    async def test_unsupported_stream_ids_are_not_reported_as_stored(self):
+        # Redis < 7 rejects every <ms>-* entry ID
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        invalid_id = redis.ResponseError('ERR Invalid stream ID specified as stream command argument')
+        mock_pipe.execute.return_value = [invalid_id, invalid_id, 0]
+        with self.assertLogs(logger, level='INFO') as log:
+            await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        mock_pipe.execute.assert_awaited_once()
+        self.assertIn("Redis flush failed", log.output[-1])
+        self.assertEqual(self.collector._stream_watermarks['BTC/USDT:stream'], (-1, set()))
+        self.mock_sqlite_cursor.executemany.assert_called_once()
+
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    async def test_failed_redis_flush_is_reported(self, mock_sleep):
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        mock_pipe.execute.side_effect = redis.ConnectionError('Connection failed')
+        stream_batch = [{'trade_id': '1', 'timestamp': 1625256000}]
+        self.assertIsNone(await self.collector._store_trades_in_redis_pipeline('BTC/USDT:stream', stream_batch))
+        self.assertNotIn('BTC/USDT:stream', self.collector._stream_watermarks)
+
+        mock_pipe.execute.side_effect = None
+        self.assertEqual(await self.collector._store_trades_in_redis_pipeline('BTC/USDT:stream', stream_batch), 1)
+
+    async def test_large_batch_is_flushed_in_chunks(self):
+        stream_batch = [{'trade_id': str(i), 'timestamp': 1625256000 + i} for i in range(600)]
+        await self.collector._store_trades_in_redis_pipeline('BTC/USDT:stream', stream_batch)
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        self.assertEqual(mock_pipe.execute.await_count, 3)  # 256 + 256 + 88
+        self.assertEqual(mock_pipe.xadd.call_count, 600)
+        mock_pipe.xtrim.assert_called_once()
+        self.assertEqual(self.collector._stream_watermarks['BTC/USDT:stream'], (1625256599, {'599'}))
+
+    @patch('matplotlib.backends.backend_agg.FigureCanvasAgg')
+    @patch('matplotlib.figure.Figure')
+    @patch('main.MAX_PLOT_POINTS', 4)
+    async def test_visualize_data_sums_volume_per_bucket(self, mock_figure, mock_canvas):
+        self.mock_redis_client.xrange.return_value = [
+            (f'{1625256000 + i}-0'.encode(), {b'timestamp': str(1625256000 + i).encode(),
+                                              b'price': str(50000 + i).encode(), b'amount': b'1.0'})
+            for i in range(10)
+        ]
+        await self.collector.visualize_data('BTC/USDT', output_path='plot.png')
+        axes = mock_figure.return_value.add_subplot.return_value
+        prices = axes.plot.call_args[0][1]
+        volumes = axes.bar.call_args[0][1]
+        self.assertEqual(list(prices), [50000, 50003, 50006, 50009])  # buckets of 3 trades
+        self.assertEqual(list(volumes), [3.0, 3.0, 3.0, 1.0])
+        mock_figure.return_value.savefig.assert_called_once_with('plot.png')
+
+    async def test_search_data_reads_stream_range(self):
+        self.mock_redis_client.xrange.return_value = [(b'1625256000-0', {b'price': b'50000', b'side': b'buy'})]
+        results = await self.collector.search_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
+        self.assertEqual(results, [{'price': '50000', 'side': 'buy'}])
+        self.mock_redis_client.xrange.assert_called_once_with('BTC/USDT:stream', min=1625256000, max=1625256001)
+
+    async def test_fetch_skips_trades_already_in_stream(self):
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        self.assertEqual(self.mock_redis_client.pipeline.return_value.xadd.call_count, 2)
+
+    async def test_watermark_is_seeded_from_stream_top(self):
+        # Two entries share the top millisecond; both IDs must be recognised after a restart
+        self.mock_redis_client.xrevrange.side_effect = [
+            [(b'1625256001-1', {b'trade_id': b'3'})],
+            [(b'1625256001-1', {b'trade_id': b'3'}), (b'1625256001-0', {b'trade_id': b'2'})],
+        ]
+        self.mock_exchange.fetch_trades.return_value = [
+            {'id': '1', 'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'},
+            {'id': '2', 'timestamp': 1625256001, 'symbol': 'BTC/USDT', 'price': 50100, 'amount': 0.3, 'side': 'sell'},
+            {'id': '3', 'timestamp': 1625256001, 'symbol': 'BTC/USDT', 'price': 50100, 'amount': 0.3, 'side': 'sell'},
+            {'id': '4', 'timestamp': 1625256002, 'symbol': 'BTC/USDT', 'price': 50200, 'amount': 0.1, 'side': 'buy'},
+        ]
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        self.mock_redis_client.xrevrange.assert_called_with('BTC/USDT:stream', max='1625256001', min='1625256001')
+        mock_pipe = self.mock_redis_client.pipeline.return_value
+        self.assertEqual([call[0][1]['trade_id'] for call in mock_pipe.xadd.call_args_list], ['4'])
+
+    @patch('asyncio.sleep', new_callable=AsyncMock)
+    async def test_fetch_backs_up_to_sqlite_when_redis_is_down(self, mock_sleep):
+        self.mock_redis_client.xrevrange.side_effect = redis.ConnectionError('Connection refused')
+        self.mock_redis_client.pipeline.return_value.execute.side_effect = redis.ConnectionError('Connection refused')
+        await self.collector.fetch_trades_and_order_book(symbol='BTC/USDT')
+        self.mock_sqlite_cursor.executemany.assert_called_once()
+        self.assertEqual(len(self.mock_sqlite_cursor.executemany.call_args[0][1]), 2)
+        # The seed is retried on the next fetch rather than cached as an empty stream
+        self.assertNotIn('BTC/USDT:stream', self.collector._stream_watermarks)
+
+    async def test_search_backup_data_uses_read_only_connection(self):
+        self.mock_sqlite_conn.execute.return_value.fetchall.return_value = [{'trade_id': '1', 'price': 50000.0}]
+        results = await self.collector.search_backup_data(symbol='BTC/USDT', start_time=1625256000, end_time=1625256001)
+        self.assertEqual(results, [{'trade_id': '1', 'price': 50000.0}])
+        self.assertEqual(self.mock_sqlite_conn.execute.call_args[0][1], ('BTC/USDT', 1625256000, 1625256001))
+        read_uri = self.mock_sqlite_connect.call_args[0][0]
+        self.assertTrue(read_uri.startswith('file:') and read_uri.endswith('?mode=ro'))
+        self.assertTrue(self.mock_sqlite_connect.call_args[1]['uri'])
+
+    @patch('main.READ_POOL_TIMEOUT', 0.01)
+    async def test_search_backup_data_does_not_block_on_empty_pool(self):
+        while not self.collector._read_pool.empty():
+            self.collector._read_pool.get_nowait()
+        self.assertEqual(await self.collector.search_backup_data(symbol='BTC/USDT'), [])
+
+    async def test_search_backup_data_fails_fast_after_stop(self):
+        self.collector.scheduler = MagicMock()
+        self.mock_exchange.close = AsyncMock()
+        self.mock_redis_client.close = AsyncMock()
+        await self.collector.stop_collecting()
+        results = await asyncio.wait_for(self.collector.search_backup_data(symbol='BTC/USDT'), timeout=1)
+        self.assertEqual(results, [])
+        self.assertTrue(self.collector._read_pool.empty())
+
+    async def test_stop_collecting_closes_every_resource(self):
+        # The scheduler was never started and the exchange fails to close; the rest must still be released
+        self.mock_exchange.close = AsyncMock(side_effect=ccxt.NetworkError('Connection reset'))
+        self.mock_redis_client.close = AsyncMock()
+        await self.collector.stop_collecting()
+        self.mock_redis_client.close.assert_awaited_once()
+        self.mock_sqlite_conn.close.assert_called()
+        self.assertTrue(self.collector._read_pool.empty())
+
+    async def test_latency_in_data_storage(self):
         import timeit
         trade_data = {'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'}
-        primary_key = 'BTC/USDT:1:1625256000'
-        latency = timeit.timeit(lambda: self.collector._store_trade_in_redis(primary_key, trade_data), number=100)
+        stream_key = 'BTC/USDT:stream'
+        start = timeit.default_timer()
+        for _ in range(100):
+            await self.collector._store_trade_in_redis(stream_key, trade_data)
+        latency = timeit.default_timer() - start
         self.assertLess(latency, 0.5, "Latency in storing data is too high")
 
-    def test_redis_large_volume_storage(self):
+    async def test_redis_large_volume_storage(self):
         trade_data = {'timestamp': 1625256000, 'symbol': 'BTC/USDT', 'price': 50000, 'amount': 0.5, 'side': 'buy'}
         for i in range(10000):  # Reduced from 1,000,000 to 10,000 to make the test faster
-            primary_key = f'BTC/USDT:{i}:{1625256000 + i}'
-            self.collector._store_trade_in_redis(primary_key, trade_data)
-        self.assertTrue(self.mock_redis_client.hset.called)
+            await self.collector._store_trade_in_redis('BTC/USDT:stream', trade_data)
+        self.assertTrue(self.mock_redis_client.xadd.called)
+
+    async def test_start_collecting_coalesces_missed_runs(self):
+        self.collector.start_collecting(symbol='BTC/USDT', interval_seconds=10)
+        job = self.collector.scheduler.get_jobs()[0]
+        self.assertTrue(job.coalesce)
+        self.assertEqual(job.max_instances, 1)
+        self.assertEqual(job.misfire_grace_time, 5)
+        self.collector.scheduler.shutdown(wait=False)
 
 
 if __name__ == '__main__':